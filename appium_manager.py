@@ -1,13 +1,37 @@
-"""Singleton Appium session manager for the MCP server."""
+"""Singleton Appium session manager for the MCP server.
 
-import base64
-import sys
-from typing import Optional
+The Appium client (and the selenium webdriver package it pulls in) is
+imported lazily on first use so the MCP handshake isn't held up by it.
+"""
+
+from __future__ import annotations
 
-from appium import webdriver
-from appium.webdriver.common.appiumby import AppiumBy
+import base64
+import functools
+import json
+import os
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+from xml.etree import ElementTree as ET
+
+import httpx
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    MoveTargetOutOfBoundsException,
+    StaleElementReferenceException,
+    UnknownMethodException,
+    WebDriverException,
+)
 from config import load_config
 
+if TYPE_CHECKING:
+    from appium import webdriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+T = TypeVar("T")
+
 # ---------------------------------------------------------------------------
 # Module-level singleton
 # ---------------------------------------------------------------------------
@@ -25,24 +49,61 @@ def get_manager() -> "AppiumManager":
 # ---------------------------------------------------------------------------
 # Locator strategy mapping
 # ---------------------------------------------------------------------------
-_STRATEGY_MAP = {
-    "id": AppiumBy.ID,
-    "xpath": AppiumBy.XPATH,
-    "accessibility_id": AppiumBy.ACCESSIBILITY_ID,
-    "class_name": AppiumBy.CLASS_NAME,
-    "android_uiautomator": AppiumBy.ANDROID_UIAUTOMATOR,
-    "ios_predicate": AppiumBy.IOS_PREDICATE,
-    "ios_class_chain": AppiumBy.IOS_CLASS_CHAIN,
+# Values are the AppiumBy constants spelled out: importing AppiumBy would load
+# the whole appium.webdriver package at module import time.
+# Ordered fastest-first; xpath builds a full DOM of the UI tree per query.
+_STRATEGIES = {
+    "accessibility_id": "accessibility id",
+    "id": "id",
+    "android_uiautomator": "-android uiautomator",
+    "ios_predicate": "-ios predicate string",
+    "ios_class_chain": "-ios class chain",
+    "class_name": "class name",
+    "xpath": "xpath",
 }
+# Also accept the canonical AppiumBy values themselves as strategy names.
+_STRATEGY_MAP = MappingProxyType(
+    {**{v: v for v in _STRATEGIES.values()}, **_STRATEGIES}
+)
 
 
+@functools.lru_cache(maxsize=32)
 def _resolve_strategy(strategy: str):
-    return _STRATEGY_MAP.get(strategy.lower(), AppiumBy.XPATH)
+    by = _STRATEGY_MAP.get(strategy.lower())
+    if by is None:
+        raise ValueError(f"Unknown strategy {strategy}; use one of {list(_STRATEGIES)}")
+    return by
+
+
+# W3C key under which findElement returns the element reference.
+_W3C_ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+
+def _element_script(by: str, value: str, command: str, *args) -> str:
+    """Build a webdriverio script that finds an element, runs one command on
+    it and returns the element reference."""
+    call_args = "".join(f", {json.dumps(a)}" for a in args)
+    return (
+        f"const el = await driver.findElement({json.dumps(by)}, {json.dumps(value)});\n"
+        f"await driver.{command}(el[{json.dumps(_W3C_ELEMENT_KEY)}]{call_args});\n"
+        f"return el;"
+    )
+
+
+# How long a page source snapshot or element reference is reused (seconds).
+_CACHE_TTL = 1.5
+
+
+_LOG_PREFIX = b"[appium-mcp] "
 
 
 def _log(msg: str) -> None:
-    """Log to stderr (STDIO transport must keep stdout clean)."""
-    print(f"[appium-mcp] {msg}", file=sys.stderr, flush=True)
+    """Log to stderr (STDIO transport must keep stdout clean).
+
+    Writes straight to fd 2 in one syscall, bypassing sys.stderr's text
+    layer, its lock and the explicit flush.
+    """
+    os.write(2, _LOG_PREFIX + msg.encode("utf-8", "replace") + b"\n")
 
 
 # ---------------------------------------------------------------------------
@@ -52,6 +113,23 @@ class AppiumManager:
     def __init__(self) -> None:
         self.driver: Optional[webdriver.Remote] = None
         self.config: dict = load_config()
+        self._window_size: Optional[dict] = None
+        # Cleared once the server turns out not to support execute_driver.
+        self._driver_scripts: bool = True
+        self._ps_cache: Optional[tuple[float, str]] = None
+        # Bumped on every invalidation so a fetch that was in flight when the
+        # UI changed doesn't store its (now stale) result.
+        self._cache_gen: int = 0
+        self._el_cache: dict[tuple[str, str], tuple[float, WebElement]] = {}
+        # True/False when our own actions tell us; None when the screen
+        # changed in a way that may have shown or hidden the keyboard.
+        self._keyboard_visible: Optional[bool] = None
+        # Non-blocking client for read-only endpoints, so independent reads
+        # issued concurrently by the MCP client overlap instead of serializing.
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _appium_url(self) -> str:
+        return self.config.get("appium", {}).get("url", "http://localhost:4723").rstrip("/")
 
     # ------ session lifecycle ------
 
@@ -62,55 +140,108 @@ class AppiumManager:
 
         cfg = self.config
         platform = cfg["platform"].lower()
-        appium_url = cfg.get("appium", {}).get("url", "http://localhost:4723")
+        appium_url = self._appium_url()
 
         if platform == "android":
+            from appium.options.android import UiAutomator2Options
+
             acfg = cfg["android"]
-            caps = {
-                "platformName": "Android",
-                "appium:automationName": "UiAutomator2",
-                "appium:deviceName": acfg.get("device_name", "Android Emulator"),
-                "appium:platformVersion": acfg.get("platform_version", "16"),
-                "appium:newCommandTimeout": 3600,
-                "appium:noReset": True,
-                "appium:autoGrantPermissions": True,
-            }
+            options = UiAutomator2Options()  # sets platformName/automationName
+            options.device_name = acfg.get("device_name", "Android Emulator")
+            options.platform_version = acfg.get("platform_version", "16")
+            options.new_command_timeout = 3600
+            options.no_reset = True
+            options.auto_grant_permissions = True
             if acfg.get("app_package"):
-                caps["appium:appPackage"] = acfg["app_package"]
+                options.app_package = acfg["app_package"]
             if acfg.get("app_activity"):
-                caps["appium:appActivity"] = acfg["app_activity"]
+                options.app_activity = acfg["app_activity"]
             if acfg.get("app_path"):
-                caps["appium:app"] = acfg["app_path"]
+                options.app = acfg["app_path"]
 
         elif platform == "ios":
+            from appium.options.ios import XCUITestOptions
+
             icfg = cfg["ios"]
-            caps = {
-                "platformName": "iOS",
-                "appium:automationName": "XCUITest",
-                "appium:deviceName": icfg.get("device_name", "iPhone 15"),
-                "appium:platformVersion": icfg.get("platform_version", "17.0"),
-                "appium:newCommandTimeout": 3600,
-                "appium:noReset": True,
-                "appium:autoAcceptAlerts": True,
-            }
+            options = XCUITestOptions()  # sets platformName/automationName
+            options.device_name = icfg.get("device_name", "iPhone 15")
+            options.platform_version = icfg.get("platform_version", "17.0")
+            options.new_command_timeout = 3600
+            options.no_reset = True
+            options.auto_accept_alerts = True
             if icfg.get("bundle_id"):
-                caps["appium:bundleId"] = icfg["bundle_id"]
+                options.bundle_id = icfg["bundle_id"]
             if icfg.get("app_path"):
-                caps["appium:app"] = icfg["app_path"]
+                options.app = icfg["app_path"]
         else:
             raise ValueError(f"Unsupported platform: {platform}")
 
+        from appium import webdriver
+
+        # Every tool call is a separate POST; reuse pooled connections for all.
+        executor = _pooled_connection(appium_url)
+        reuse = cfg.get("appium", {}).get("reuse_session", False)
+
+        if reuse and self._reattach(executor, options, appium_url, platform):
+            return f"Session reattached on {platform}"
+
         _log(f"Connecting to Appium at {appium_url} ({platform})")
-        self.driver = webdriver.Remote(appium_url, options=_caps_to_options(caps))
+        self.driver = webdriver.Remote(executor, options=options)
+        # Cached for swipe coordinates; swipe refetches it after a rotation.
+        self._window_size = self.driver.get_window_size()
+        if reuse:
+            _save_session({
+                "session_id": self.driver.session_id,
+                "url": appium_url,
+                "platform": platform,
+                "requested": options.to_capabilities(),
+                "caps": self.driver.caps,
+            })
         _log("Session started")
         return f"Session started on {platform}"
 
+    def _reattach(self, executor, options, appium_url: str, platform: str) -> bool:
+        """Attach to the session saved by a previous server process, if still alive.
+
+        The saved session must have been requested with the same capabilities
+        (device, OS version, app), so a server shared by several devices never
+        hands back another device's session.
+        """
+        saved = _load_saved_session()
+        if (
+            not saved
+            or saved.get("url") != appium_url
+            or saved.get("platform") != platform
+            or saved.get("requested") != options.to_capabilities()
+        ):
+            return False
+
+        driver = _attach_remote(executor, options, saved["session_id"], saved.get("caps", {}))
+        try:
+            self._window_size = driver.get_window_size()
+        except WebDriverException:
+            _log("Saved session is gone — starting a new one")
+            _forget_session()
+            return False
+
+        self.driver = driver
+        _log(f"Reattached to session {saved['session_id']}")
+        return True
+
+    async def close_http(self) -> None:
+        """Close the async HTTP client used for read-only endpoints."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
     def close_session(self) -> str:
         """Quit the Appium driver and reset the singleton."""
         global _manager
         if self.driver is not None:
             self.driver.quit()
             self.driver = None
+            self._window_size = None
+            _forget_session()
             _log("Session closed")
         _manager = None
         return "Session closed"
@@ -118,131 +249,492 @@ class AppiumManager:
     # ------ queries ------
 
     def _is_session_alive(self) -> bool:
-        """Check whether the Appium session is still valid."""
+        """Cheaply check that the Appium server behind the session is still up.
+
+        Only a definite error answer counts as dead; timeouts and network
+        errors are inconclusive and count as alive, leaving _with_retry to
+        catch a session that is really gone. Never quit a session on the
+        strength of this probe alone.
+        """
         if self.driver is None:
             return False
         try:
-            # Use a mobile-safe command to probe the Appium server.
-            # driver.title throws on native apps; get_window_size() works everywhere.
-            self.driver.get_window_size()
+            # GET /status over the driver's pooled connection. It is answered
+            # by the Appium server itself, with no hop to UIA2/WDA.
+            self.driver.get_status()
             return True
-        except Exception:
+        except WebDriverException:
             return False
+        except Exception:
+            return True
 
     def _ensure_driver(self) -> webdriver.Remote:
         if self.driver is None:
             raise RuntimeError("No active session. Call start_session first.")
-        if not self._is_session_alive():
+        return self.driver
+
+    def _drop_driver(self) -> None:
+        """Discard the current driver, ignoring errors from a dead session."""
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.driver = None
+        self._window_size = None
+        self._invalidate_caches()
+        _forget_session()
+
+    def _invalidate_caches(self, elements: bool = True) -> None:
+        """Forget the cached page source and, if elements, element references
+        and the known keyboard state."""
+        self._ps_cache = None
+        self._cache_gen += 1
+        if elements:
+            self._el_cache.clear()
+            self._keyboard_visible = None
+
+    def _with_retry(self, fn: Callable[[webdriver.Remote], T]) -> T:
+        """Run fn(driver), reconnecting once if the session has expired.
+
+        Liveness is detected lazily from the command's own failure rather
+        than probed up front, so a healthy session costs no extra round-trip.
+        """
+        driver = self._ensure_driver()
+        try:
+            return fn(driver)
+        except InvalidSessionIdException:
             _log("Session expired — reconnecting automatically")
-            try:
-                self.driver.quit()
-            except Exception:
-                pass
-            self.driver = None
+            self._drop_driver()
             self.start_session()
-        return self.driver
+            return fn(self.driver)
 
     def take_screenshot(self) -> bytes:
         """Return raw PNG bytes of the current screen."""
+        return self._with_retry(lambda d: d.get_screenshot_as_png())
+
+    def get_page_source(self, compact: bool = False) -> str:
+        """Return the UI hierarchy as XML, reusing a snapshot younger than _CACHE_TTL.
+
+        With compact=True, noise attributes and undiscoverable subtrees are
+        stripped (see _compact_source).
+        """
+        if self._ps_cache is not None and time.monotonic() - self._ps_cache[0] < _CACHE_TTL:
+            source = self._ps_cache[1]
+        else:
+            source = self._with_retry(lambda d: d.page_source)
+            self._ps_cache = (time.monotonic(), source)
+        return _compact_source(source) if compact else source
+
+    async def _session_get(self, endpoint: str):
+        """GET /session/{id}/<endpoint> without blocking the event loop.
+
+        Returns None if the session has expired, so callers can fall back to
+        the driver path, which reconnects.
+        """
         driver = self._ensure_driver()
-        b64 = driver.get_screenshot_as_base64()
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self._appium_url(),
+                limits=httpx.Limits(max_keepalive_connections=4),
+                timeout=60,
+            )
+        resp = await self._http.get(f"/session/{driver.session_id}/{endpoint}")
+        try:
+            value = resp.json().get("value")
+        except ValueError:  # e.g. an HTML error page from a proxy
+            value = None
+            if resp.status_code == 200:
+                raise WebDriverException(f"{endpoint} returned a non-JSON body: {resp.text[:200]}")
+        if resp.status_code == 200:
+            return value
+        error = value.get("error") if isinstance(value, dict) else None
+        if error == "invalid session id":
+            return None
+        message = value.get("message") if isinstance(value, dict) else resp.text
+        raise WebDriverException(f"{endpoint} failed ({error or resp.status_code}): {message}")
+
+    async def take_screenshot_async(self) -> bytes:
+        """Async variant of take_screenshot."""
+        b64 = await self._session_get("screenshot")
+        if b64 is None:
+            return self.take_screenshot()
         return base64.b64decode(b64)
 
-    def get_page_source(self) -> str:
-        """Return the UI hierarchy as XML."""
-        return self._ensure_driver().page_source
+    async def get_page_source_async(self, compact: bool = False) -> str:
+        """Async variant of get_page_source, sharing its snapshot cache."""
+        if self._ps_cache is not None and time.monotonic() - self._ps_cache[0] < _CACHE_TTL:
+            source = self._ps_cache[1]
+        else:
+            gen = self._cache_gen
+            source = await self._session_get("source")
+            if source is None:
+                return self.get_page_source(compact)
+            if self._cache_gen == gen:
+                self._ps_cache = (time.monotonic(), source)
+        return _compact_source(source) if compact else source
 
     # ------ element actions ------
 
+    def _element_action(
+        self,
+        strategy: str,
+        value: str,
+        command: str,
+        fallback: Callable[[WebElement], None],
+        *args,
+    ) -> None:
+        """Locate an element and act on it in one round-trip when possible.
+
+        A recently located element for the same locator is reused directly.
+        Otherwise Appium's execute_driver endpoint runs find + command as one
+        request. Script errors are raised as-is rather than retried locally,
+        since the command may already have run; only a server that doesn't
+        know execute_driver disables scripts, falling back to find_element
+        for the rest of the process.
+        """
+        by = _resolve_strategy(strategy)
+        key = (by, value)
+
+        cached = self._el_cache.pop(key, None)
+        if cached is not None and time.monotonic() - cached[0] < _CACHE_TTL:
+            try:
+                fallback(cached[1])
+                self._el_cache[key] = cached
+                return
+            except (StaleElementReferenceException, InvalidSessionIdException):
+                pass  # re-locate below
+
+        if self._driver_scripts:
+            script = _element_script(by, value, command, *args)
+            try:
+                result = self._with_retry(lambda d: d.execute_driver(script)).result
+            except InvalidSessionIdException:
+                raise
+            except WebDriverException as e:
+                if not _is_unknown_command(e):
+                    raise
+                self._driver_scripts = False
+                _log("execute_driver unavailable — using client-side element actions")
+            else:
+                el = _as_element(self.driver, result)
+                if el is not None:
+                    self._el_cache[key] = (time.monotonic(), el)
+                return
+
+        def _find_and_act(driver: webdriver.Remote) -> WebElement:
+            el = driver.find_element(by, value)
+            fallback(el)
+            return el
+
+        el = self._with_retry(_find_and_act)
+        self._el_cache[key] = (time.monotonic(), el)
+
     def tap(self, strategy: str, value: str) -> str:
         """Find an element and click it."""
-        driver = self._ensure_driver()
-        el = driver.find_element(_resolve_strategy(strategy), value)
-        el.click()
+        self._element_action(strategy, value, "elementClick", lambda el: el.click())
+        self._invalidate_caches()
         return f"Tapped element ({strategy}={value})"
 
     def tap_coordinates(self, x: int, y: int) -> str:
         """Tap at absolute screen coordinates."""
-        self._ensure_driver().tap([(x, y)])
+        self._with_retry(lambda d: d.tap([(x, y)]))
+        self._invalidate_caches()
         return f"Tapped at ({x}, {y})"
 
     def type_text(self, strategy: str, value: str, text: str) -> str:
         """Find an element and type text into it."""
-        driver = self._ensure_driver()
-        el = driver.find_element(_resolve_strategy(strategy), value)
-        el.send_keys(text)
+        self._element_action(
+            strategy, value, "elementSendKeys", lambda el: el.send_keys(text), text
+        )
+        self._invalidate_caches(elements=False)
+        self._keyboard_visible = True
         return f"Typed '{text}' into ({strategy}={value})"
 
     def clear_text(self, strategy: str, value: str) -> str:
         """Find an element and clear its text."""
-        driver = self._ensure_driver()
-        el = driver.find_element(_resolve_strategy(strategy), value)
-        el.clear()
+        self._element_action(strategy, value, "elementClear", lambda el: el.clear())
+        self._invalidate_caches(elements=False)
         return f"Cleared text in ({strategy}={value})"
 
     # ------ gestures ------
 
     def swipe(self, direction: str, duration: int = 800) -> str:
         """Swipe in a direction (up/down/left/right) using 80%/20% coordinates."""
-        driver = self._ensure_driver()
-        size = driver.get_window_size()
-        w, h = size["width"], size["height"]
-
-        if direction == "up":
-            driver.swipe(w // 2, int(h * 0.8), w // 2, int(h * 0.2), duration)
-        elif direction == "down":
-            driver.swipe(w // 2, int(h * 0.2), w // 2, int(h * 0.8), duration)
-        elif direction == "left":
-            driver.swipe(int(w * 0.8), h // 2, int(w * 0.2), h // 2, duration)
-        elif direction == "right":
-            driver.swipe(int(w * 0.2), h // 2, int(w * 0.8), h // 2, duration)
-        else:
+        if direction not in ("up", "down", "left", "right"):
             raise ValueError(f"Invalid direction: {direction}. Use up/down/left/right.")
 
+        def _swipe(driver: webdriver.Remote) -> None:
+            size = self._window_size or driver.get_window_size()
+            try:
+                _perform_swipe(driver, *_swipe_points(direction, size), duration)
+            except MoveTargetOutOfBoundsException:
+                # The cached size predates a rotation; refresh it and retry once.
+                self._window_size = driver.get_window_size()
+                _perform_swipe(driver, *_swipe_points(direction, self._window_size), duration)
+
+        self._with_retry(_swipe)
+        self._invalidate_caches()
         return f"Swiped {direction}"
 
     # ------ device buttons ------
 
     def press_back(self) -> str:
         """Press the Android back button."""
-        self._ensure_driver().back()
+        self._with_retry(lambda d: d.back())
+        # Back dismisses a visible keyboard before it navigates anywhere.
+        was_visible = self._keyboard_visible
+        self._invalidate_caches()
+        if was_visible:
+            self._keyboard_visible = False
         return "Pressed back"
 
     def press_home(self) -> str:
         """Press the home button via keycode."""
-        driver = self._ensure_driver()
-        driver.press_keycode(3)  # KEYCODE_HOME
+        self._with_retry(lambda d: d.press_keycode(3))  # KEYCODE_HOME
+        self._invalidate_caches()
         return "Pressed home"
 
     def hide_keyboard(self) -> str:
-        """Hide the on-screen keyboard if visible."""
-        driver = self._ensure_driver()
-        try:
-            driver.hide_keyboard()
-        except Exception:
-            pass  # keyboard may not be visible
+        """Hide the on-screen keyboard if visible.
+
+        Skips the round-trip when our own actions show the keyboard is down,
+        and asks the cheaper is_keyboard_shown() first when the state is unknown.
+        """
+        if self._keyboard_visible is False:
+            return "Keyboard not visible"
+
+        def _hide(driver: webdriver.Remote) -> bool:
+            if self._keyboard_visible is None:
+                try:
+                    if not driver.is_keyboard_shown():
+                        return False
+                except InvalidSessionIdException:
+                    raise
+                except Exception:
+                    pass  # probe unsupported or failed — just try to hide
+            try:
+                driver.hide_keyboard()
+            except InvalidSessionIdException:
+                raise
+            except Exception:
+                pass  # keyboard may not be visible
+            return True
+
+        hidden = self._with_retry(_hide)
+        self._keyboard_visible = False
+        if not hidden:
+            return "Keyboard not visible"
+        self._invalidate_caches(elements=False)
         return "Keyboard hidden (or was not visible)"
 
 
 # ---------------------------------------------------------------------------
-# Helper — convert flat caps dict to UiAutomator2Options / XCUITestOptions
+# Helpers — execute_driver support and the element references it returns
+# ---------------------------------------------------------------------------
+def _is_unknown_command(e: WebDriverException) -> bool:
+    """True if the server rejected execute_driver as an unsupported command."""
+    return isinstance(e, UnknownMethodException) or "unknown command" in (e.msg or "").lower()
+
+
+def _as_element(driver: webdriver.Remote, obj) -> Optional[WebElement]:
+    """Turn an execute_driver result into a WebElement, if it is one."""
+    from selenium.webdriver.remote.webelement import WebElement
+
+    if isinstance(obj, WebElement):
+        return obj
+    if isinstance(obj, dict) and _W3C_ELEMENT_KEY in obj:
+        return driver.create_web_element(obj[_W3C_ELEMENT_KEY])
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Helper — compact page source
+# ---------------------------------------------------------------------------
+# Boolean attributes whose "false" value carries no information for an agent.
+_NOISE_FALSE_ATTRS = frozenset({
+    "checkable", "checked", "clickable", "focused", "scrollable",
+    "long-clickable", "password", "selected",
+})
+# Attributes that make a node worth keeping: it can be located or read.
+_IDENTIFYING_ATTRS = ("text", "content-desc", "resource-id", "name", "label", "value")
+# XCUITest element types an agent can interact with even when unlabeled.
+_INTERACTIVE_IOS_TYPES = frozenset({
+    "XCUIElementTypeButton", "XCUIElementTypeCell", "XCUIElementTypeKey",
+    "XCUIElementTypeLink", "XCUIElementTypePicker", "XCUIElementTypePickerWheel",
+    "XCUIElementTypeSearchField", "XCUIElementTypeSecureTextField",
+    "XCUIElementTypeSegmentedControl", "XCUIElementTypeSlider",
+    "XCUIElementTypeStepper", "XCUIElementTypeSwitch",
+    "XCUIElementTypeTextField", "XCUIElementTypeTextView",
+})
+
+
+def _compact_source(xml: str) -> str:
+    """Shrink a page source dump while keeping everything an agent can target.
+
+    Drops empty attributes, `instance`, `index="0"` and noise booleans set to
+    "false", then removes subtrees explicitly marked clickable="false" that
+    have no text or identifiers. iOS sources carry no `clickable` attribute,
+    so their nodes are never dropped. Removed nodes shift positional XPaths,
+    so use locators from this form.
+    """
+    root = ET.fromstring(xml)
+    _strip_attrs(root)
+    for child in list(root):
+        if not _prune(child):
+            root.remove(child)
+    return ET.tostring(root, encoding="unicode")
+
+
+def _strip_attrs(el: ET.Element) -> None:
+    """Remove empty, `instance`, `index="0"` and noise-"false" attributes."""
+    attrib = el.attrib
+    for key, val in list(attrib.items()):
+        if (
+            val == ""
+            or key == "instance"
+            or (key == "index" and val == "0")
+            or (val == "false" and key in _NOISE_FALSE_ATTRS)
+        ):
+            del attrib[key]
+
+
+def _prune(el: ET.Element) -> bool:
+    """Compact el in place; return False if the whole subtree can be dropped."""
+    attrib = el.attrib
+    # Read before stripping: clickable="false" is itself a noise attribute.
+    unclickable = attrib.get("clickable") == "false"
+    _strip_attrs(el)
+
+    kept_child = False
+    for child in list(el):
+        if _prune(child):
+            kept_child = True
+        else:
+            el.remove(child)
+
+    return (
+        not unclickable
+        or kept_child
+        or any(key in attrib for key in _IDENTIFYING_ATTRS)
+        or attrib.get("accessible") == "true"
+        or attrib.get("type", el.tag) in _INTERACTIVE_IOS_TYPES
+    )
+
+
+# ---------------------------------------------------------------------------
+# Helpers — persist the session so a restarted server can reattach to it
 # ---------------------------------------------------------------------------
-def _caps_to_options(caps: dict):
-    """Convert a capabilities dict to an Appium Options object."""
-    from appium.options.android import UiAutomator2Options
-    from appium.options.ios import XCUITestOptions
+_SESSION_FILE = Path.home() / ".cache" / "appium-mcp" / "session.json"
+
+
+def _load_saved_session() -> Optional[dict]:
+    try:
+        return json.loads(_SESSION_FILE.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_session(data: dict) -> None:
+    try:
+        _SESSION_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _SESSION_FILE.write_text(json.dumps(data))
+    except OSError as e:
+        _log(f"Could not save session for reuse: {e}")
 
-    platform = caps.get("platformName", "").lower()
-    if platform == "android":
-        opts = UiAutomator2Options()
-    else:
-        opts = XCUITestOptions()
 
-    for key, value in caps.items():
-        if key == "platformName":
-            continue
-        # Strip 'appium:' prefix for the options setter
-        clean_key = key.replace("appium:", "")
-        opts.set_capability(key, value)
+def _forget_session() -> None:
+    try:
+        _SESSION_FILE.unlink()
+    except OSError:
+        pass
 
-    return opts
+
+def _attach_remote(executor, options, session_id: str, caps: dict) -> webdriver.Remote:
+    """Create a driver bound to an existing session without POST /session."""
+    from appium import webdriver
+
+    class _AttachedRemote(webdriver.Remote):
+        def start_session(self, *args, **kwargs) -> None:
+            pass  # session already exists on the server
+
+    driver = _AttachedRemote(executor, options=options)
+    driver.session_id = session_id
+    driver.caps = caps
+    return driver
+
+
+# ---------------------------------------------------------------------------
+# Helper — keep-alive connection with a bounded, retrying pool
+# ---------------------------------------------------------------------------
+def _pooled_connection(appium_url: str):
+    """Create the command executor for a session.
+
+    urllib3's default pool (block=False) opens and discards extra sockets
+    under bursts, defeating keep-alive; this one blocks for a free socket
+    instead and retries transient gateway errors on idempotent requests.
+    """
+    import urllib3
+    from appium.webdriver.appium_connection import AppiumConnection
+
+    class _PooledConnection(AppiumConnection):
+        def _get_connection_manager(self):
+            # Extend the manager selenium builds so its proxy, CA and timeout
+            # settings are kept; pool kwargs apply to pools created later.
+            manager = super()._get_connection_manager()
+            manager.connection_pool_kw.update(
+                maxsize=8,
+                block=True,
+                # raise_on_status=False hands the last response back to
+                # selenium, which turns it into a WebDriverException.
+                retries=urllib3.Retry(
+                    total=3,
+                    backoff_factor=0.1,
+                    status_forcelist=[502, 503, 504],
+                    raise_on_status=False,
+                ),
+            )
+            return manager
+
+    try:
+        from appium.webdriver.client_config import AppiumClientConfig
+    except ImportError:  # older Appium-Python-Client without client configs
+        return _PooledConnection(appium_url, keep_alive=True)
+    # Newer selenium deprecates passing remote_server_addr to the connection.
+    return _PooledConnection(
+        client_config=AppiumClientConfig(remote_server_addr=appium_url, keep_alive=True)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Helper — press-move-release as a single W3C Actions request
+# ---------------------------------------------------------------------------
+def _swipe_points(direction: str, size: dict) -> tuple[tuple[int, int], tuple[int, int]]:
+    """Start and end points for a swipe using 80%/20% of the window size."""
+    w, h = size["width"], size["height"]
+    if direction == "up":
+        return (w // 2, int(h * 0.8)), (w // 2, int(h * 0.2))
+    if direction == "down":
+        return (w // 2, int(h * 0.2)), (w // 2, int(h * 0.8))
+    if direction == "left":
+        return (int(w * 0.8), h // 2), (int(w * 0.2), h // 2)
+    return (int(w * 0.2), h // 2), (int(w * 0.8), h // 2)
+
+
+def _perform_swipe(
+    driver: webdriver.Remote,
+    start: tuple[int, int],
+    end: tuple[int, int],
+    duration: int,
+) -> None:
+    """Send the whole swipe gesture in one POST /actions call."""
+    from selenium.webdriver.common.actions import interaction
+    from selenium.webdriver.common.actions.action_builder import ActionBuilder
+    from selenium.webdriver.common.actions.mouse_button import MouseButton
+    from selenium.webdriver.common.actions.pointer_input import PointerInput
+
+    finger = PointerInput(interaction.POINTER_TOUCH, "finger")
+    finger.create_pointer_move(duration=0, x=start[0], y=start[1])
+    finger.create_pointer_down(button=MouseButton.LEFT)
+    finger.create_pointer_move(duration=duration, x=end[0], y=end[1])
+    finger.create_pointer_up(button=MouseButton.LEFT)
+    ActionBuilder(driver, mouse=finger).perform()
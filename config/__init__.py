@@ -1,9 +1,20 @@
+import functools
 import json
 from pathlib import Path
 
+_CONFIG_PATH = Path(__file__).parent / "test_config.json"
+
 
 def load_config() -> dict:
-    """Load test_config.json from the same directory as this module."""
-    config_path = Path(__file__).parent / "test_config.json"
+    """Load test_config.json from the same directory as this module.
+
+    The parsed result is cached per file mtime, so repeated calls are free
+    until the file changes on disk. The returned dict is shared — don't mutate it.
+    """
+    return _load_cached(_CONFIG_PATH, _CONFIG_PATH.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_cached(config_path: Path, mtime_ns: int) -> dict:
     with open(config_path) as f:
         return json.load(f)
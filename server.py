@@ -3,7 +3,7 @@
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.utilities.types import Image
 
-from appium_manager import get_manager
+from appium_manager import AppiumManager, get_manager
 
 mcp = FastMCP("appium")
 
@@ -21,9 +21,11 @@ def start_session() -> str:
 
 
 @mcp.tool()
-def close_session() -> str:
+async def close_session() -> str:
     """Close the active Appium session and release the device."""
-    return get_manager().close_session()
+    mgr = get_manager()
+    await mgr.close_http()
+    return mgr.close_session()
 
 
 # ---------------------------------------------------------------------------
@@ -31,18 +33,24 @@ def close_session() -> str:
 # ---------------------------------------------------------------------------
 
 @mcp.tool()
-def take_screenshot() -> Image:
+async def take_screenshot() -> Image:
     """Take a screenshot of the current device screen.
     Returns the image so you can see what is on screen."""
-    png_bytes = get_manager().take_screenshot()
+    png_bytes = await get_manager().take_screenshot_async()
     return Image(data=png_bytes, format="png")
 
 
 @mcp.tool()
-def get_page_source() -> str:
+async def get_page_source(compact: bool = False) -> str:
     """Get the UI hierarchy of the current screen as XML.
-    Use this to discover element locators (resource-id, xpath, accessibility id, etc.)."""
-    return get_manager().get_page_source()
+    Use this to discover element locators (resource-id, xpath, accessibility id, etc.).
+
+    Args:
+        compact: Strip default-valued attributes and drop decorative nodes with
+                 no text, id or click handler. Much smaller on complex screens;
+                 prefer non-positional locators when using it.
+    """
+    return await get_manager().get_page_source_async(compact)
 
 
 # ---------------------------------------------------------------------------
@@ -54,8 +62,9 @@ def tap(strategy: str, value: str) -> str:
     """Tap on an element found by the given locator strategy.
 
     Args:
-        strategy: Locator strategy — one of: id, xpath, accessibility_id,
-                  class_name, android_uiautomator, ios_predicate, ios_class_chain
+        strategy: Locator strategy — one of (fastest first): accessibility_id, id,
+                  android_uiautomator, ios_predicate, ios_class_chain, class_name,
+                  xpath. Avoid xpath unless nothing else identifies the element.
         value: The locator value (e.g. "com.app:id/login_btn" for id strategy)
     """
     return get_manager().tap(strategy, value)
@@ -77,7 +86,7 @@ def type_text(strategy: str, value: str, text: str) -> str:
     """Type text into an element found by the given locator strategy.
 
     Args:
-        strategy: Locator strategy (id, xpath, accessibility_id, etc.)
+        strategy: Locator strategy (accessibility_id, id, ..., xpath as a last resort)
         value: The locator value
         text: The text to type into the element
     """
@@ -89,7 +98,7 @@ def clear_text(strategy: str, value: str) -> str:
     """Clear the text content of an element found by the given locator strategy.
 
     Args:
-        strategy: Locator strategy (id, xpath, accessibility_id, etc.)
+        strategy: Locator strategy (accessibility_id, id, ..., xpath as a last resort)
         value: The locator value
     """
     return get_manager().clear_text(strategy, value)
@@ -131,6 +140,54 @@ def hide_keyboard() -> str:
     return get_manager().hide_keyboard()
 
 
+# ---------------------------------------------------------------------------
+# Batching
+# ---------------------------------------------------------------------------
+
+_BATCH_OPS = {
+    "get_page_source": AppiumManager.get_page_source,
+    "tap": AppiumManager.tap,
+    "tap_coordinates": AppiumManager.tap_coordinates,
+    "type_text": AppiumManager.type_text,
+    "clear_text": AppiumManager.clear_text,
+    "swipe": AppiumManager.swipe,
+    "press_back": AppiumManager.press_back,
+    "press_home": AppiumManager.press_home,
+    "hide_keyboard": AppiumManager.hide_keyboard,
+}
+
+
+@mcp.tool()
+def batch(actions: list[dict]) -> list[str]:
+    """Run several actions in one call, in order, and return each result.
+    Prefer this over separate tool calls when you already know the sequence
+    (e.g. fill a form and submit). Stops at the first failing action.
+
+    Args:
+        actions: List of {"op": <tool name>, "args": {<tool arguments>}}, e.g.
+                 [{"op": "type_text", "args": {"strategy": "id", "value": "email",
+                 "text": "a@b.c"}}, {"op": "tap", "args": {"strategy":
+                 "accessibility_id", "value": "login"}}].
+                 Supported ops: get_page_source, tap, tap_coordinates,
+                 type_text, clear_text, swipe, press_back, press_home,
+                 hide_keyboard
+    """
+    mgr = get_manager()
+    results = []
+    for i, action in enumerate(actions):
+        op = action.get("op")
+        fn = _BATCH_OPS.get(op)
+        if fn is None:
+            results.append(f"Error at action {i}: unknown op {op!r}")
+            break
+        try:
+            results.append(fn(mgr, **action.get("args", {})))
+        except Exception as e:
+            results.append(f"Error at action {i} ({op}): {e}")
+            break
+    return results
+
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------